@@ -1,9 +1,63 @@
 import requests
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+import numpy as np
 from rdkit import Chem
 from urllib.parse import quote
-import json
-from typing import List, Optional, Dict, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache, partial
+from threading import Lock
+import orjson
+from typing import List, Optional, Dict, Tuple
 
+MAX_WORKERS: int = 16
+CACHE_NAME: str = "pubchem_cache"
+CACHE_EXPIRE_AFTER: timedelta = timedelta(days=30)
+# Fixed member names of the edge-relations NPZ file; drug names are stored as data, never as member names.
+NAMES_KEY: str = "names"
+COUNTS_KEY: str = "counts"
+EDGES_KEY: str = "edges"
+ERRORS_KEY: str = "errors"
+PUBCHEM_SMILES_URL: str = "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{}/property/SMILES/TXT"
+PUBCHEM_BATCH_URL: str = "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/property/Title,SMILES/JSON"
+
+def make_session(pool_size: int = MAX_WORKERS, cache_name: str = CACHE_NAME) -> requests.Session:
+    """
+    Create a requests session whose connection pool is large enough to be shared by all worker threads,
+    so TCP/TLS connections to PubChem are reused instead of re-established for every drug.
+    Responses are cached on disk in SQLite, so reruns read SMILES locally instead of hitting PubChem.
+
+    Parameters:
+        pool_size (int): The number of pooled connections to keep per host.
+        cache_name (str): The path of the SQLite cache file, without extension.
+
+    Returns:
+        requests.Session: A cached session mounted with a sized HTTPAdapter for https:// URLs.
+    """
+    session = CachedSession(cache_name, expire_after=CACHE_EXPIRE_AFTER, allowable_methods=("GET", "POST"))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+_default_session: Optional[requests.Session] = None
+_default_session_lock = Lock()
+
+def get_default_session() -> requests.Session:
+    """
+    Return the module-wide cached session used when a caller does not pass its own,
+    creating it with make_session on first use.
+
+    Returns:
+        requests.Session: The shared cached session.
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = make_session()
+        return _default_session
+
+@lru_cache(maxsize=1024)
 def encode_name(name: str) -> str:
     """
     Encode drug name only if it contains spaces.
@@ -11,61 +65,179 @@ def encode_name(name: str) -> str:
     """
     return quote(name) if " " in name else name
 
-def get_edge_list_from_pubchem(drug_name: str, timeout: float = 5.0) -> Optional[List[Tuple[int, int]]]:
+def fetch_smiles(drug_name: str, timeout: float = 5.0,
+                 session: Optional[requests.Session] = None) -> Optional[str]:
     """
-    Retrieve the bond-edge list of a molecule from PubChem by entering its name.
+    Retrieve the SMILES string of a molecule from PubChem by entering its name.
+    This is the I/O-only stage of the pipeline; parsing is left to smiles_to_edges.
 
     Parameters:
         drug_name (str): The name of the compound to look up on PubChem.
         timeout (float): The number of seconds to wait for an HTTP response before giving up.
+        session (Optional[requests.Session]): A session to send the request through. Defaults to get_default_session().
 
     Returns:
-        A list of (atom_index1, atom_index2) tuples if successful.
-        None on failure (network error, invalid SMILES, etc.).
+        The SMILES string if successful.
+        None if the request failed.
     """
-    url_name = encode_name(drug_name)
-    pubchem_url = (f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{url_name}/property/SMILES/TXT")
+    pubchem_url = PUBCHEM_SMILES_URL.format(encode_name(drug_name))
 
     try:
-        resp = requests.get(pubchem_url, timeout=timeout)
+        http = session if session is not None else get_default_session()
+        resp = http.get(pubchem_url, timeout=timeout)
         resp.raise_for_status()
-        raw_smiles = resp.text.strip()
+        return resp.text.strip()
 
     except requests.RequestException as exc:
         print(f"[ERROR] PubChem request failed for '{drug_name}': {exc}")
         return None
 
-    mol = Chem.MolFromSmiles(raw_smiles)
+def get_edge_list_from_pubchem(drug_name: str, timeout: float = 5.0,
+                               session: Optional[requests.Session] = None) -> Optional[List[Tuple[int, int]]]:
+    """
+    Retrieve the bond-edge list of a molecule from PubChem by entering its name.
+
+    Parameters:
+        drug_name (str): The name of the compound to look up on PubChem.
+        timeout (float): The number of seconds to wait for an HTTP response before giving up.
+        session (Optional[requests.Session]): A session to send the request through. Defaults to get_default_session().
+
+    Returns:
+        A list of (atom_index1, atom_index2) tuples if successful.
+        None on failure (network error, invalid SMILES, etc.).
+    """
+    raw_smiles = fetch_smiles(drug_name, timeout=timeout, session=session)
+    if raw_smiles is None:
+        return None
+
+    return smiles_to_edges(drug_name, raw_smiles)
+
+def smiles_to_edges(drug_name: str, raw_smiles: str) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a SMILES string with RDKit and return its bond-edge list (see mol_to_edges).
+    Only connectivity is needed, so RDKit's sanitization (aromaticity, valence and ring perception) is skipped;
+    explicit hydrogens are still removed so the graph matches the hydrogen-suppressed molecule.
+
+    Parameters:
+        drug_name (str): The name of the compound, used for error messages.
+        raw_smiles (str): The SMILES string of the compound.
+
+    Returns:
+        A list of (atom_index1, atom_index2) tuples if successful.
+        None if the SMILES string cannot be parsed.
+    """
+    mol = Chem.MolFromSmiles(raw_smiles, sanitize=False)
     if mol is None:
         print(f"[ERROR] Invalid SMILES for '{drug_name}': {raw_smiles}")
         return None
 
-    edges: List[Tuple[int, int]] = []
-    for bond in mol.GetBonds():
-        i = bond.GetBeginAtomIdx()
-        j = bond.GetEndAtomIdx()
-        edges.append((i, j))
+    return mol_to_edges(Chem.RemoveHs(mol, sanitize=False))
+
+def mol_to_edges(mol: Chem.Mol) -> List[Tuple[int, int]]:
+    """
+    Return the bond-edge list of an RDKit molecule.
+    The bonds are read in one shot from the upper triangle of RDKit's adjacency matrix,
+    so each edge is listed once as (i, j) with i < j.
+
+    Parameters:
+        mol (Chem.Mol): The parsed molecule.
+
+    Returns:
+        A list of (atom_index1, atom_index2) tuples.
+    """
+    adj = Chem.GetAdjacencyMatrix(mol)
+    src, dst = np.triu(adj, k=1).nonzero()
+    edges: List[Tuple[int, int]] = list(zip(src.tolist(), dst.tolist()))
 
     return edges
 
-def save_edge_relations_to_json(drug_list: List[str], filename: str) -> None:
+def get_smiles_batch(drug_names: List[str], timeout: float = 30.0,
+                     session: Optional[requests.Session] = None) -> Dict[str, str]:
+    """
+    Retrieve the SMILES strings of many compounds from PubChem with a single POST request.
+
+    PubChem's property table does not echo the queried names back, so each row's Title is
+    matched case-insensitively against the requested names. Names that cannot be matched
+    are left out of the result so the caller can fall back to per-name requests.
+
+    Parameters:
+        drug_names (List[str]): The names of the compounds to look up on PubChem.
+        timeout (float): The number of seconds to wait for an HTTP response before giving up.
+        session (Optional[requests.Session]): A session to send the request through. Defaults to get_default_session().
+
+    Returns:
+        Dict[str, str]: A dictionary mapping each matched drug name to its SMILES string.
+    """
+    try:
+        http = session if session is not None else get_default_session()
+        resp = http.post(PUBCHEM_BATCH_URL, data={"name": "\n".join(drug_names)}, timeout=timeout)
+        resp.raise_for_status()
+        rows = resp.json()["PropertyTable"]["Properties"]
+
+    except (requests.RequestException, ValueError, KeyError) as exc:
+        print(f"[ERROR] PubChem batch request failed: {exc}")
+        return {}
+
+    wanted = {name.lower(): name for name in drug_names}
+    smiles: Dict[str, str] = {}
+    for row in rows:
+        name = wanted.get(str(row.get("Title", "")).lower())
+        if name is not None and "SMILES" in row and name not in smiles:
+            smiles[name] = row["SMILES"]
+
+    return smiles
+
+def save_edge_relations(drug_list: List[str], filename: str, max_workers: int = MAX_WORKERS) -> None:
     """
-    Use the PubChem database to query each drug's bond-edge list and save the results to a JSON file.
+    Use the PubChem database to query each drug's bond-edge list and save the results to a compressed NPZ file.
+
+    The file has four fixed members: NAMES_KEY holds the names of the drugs with edges, COUNTS_KEY their
+    edge counts, and EDGES_KEY all of their edges concatenated in that order as one (E_total, 2) int32 array.
+    Drugs whose edges could not be determined are collected into a JSON object of error dictionaries
+    stored under ERRORS_KEY.
+
+    The work runs in two stages. First all SMILES strings are gathered: one batch call, then individual
+    concurrent requests from a thread pool sharing one session for drugs the batch call did not return.
+    Then every SMILES string is parsed locally, so request failures and parse failures are reported separately.
 
     Parameters:
         drug_list (List[str]):  a list of compound names.
-        filename (str): the path to the output JSON file.
+        filename (str): the path to the output NPZ file.
+        max_workers (int): the number of concurrent PubChem requests.
     """
-    edge_relations: Dict[str, Union[List[Tuple[int,int]], Dict[str,str]]] = {}
+    with make_session(max_workers) as session:
+        smiles: Dict[str, Optional[str]] = dict(get_smiles_batch(drug_list, session=session))
+
+        missing = [name for name in drug_list if name not in smiles]
+        if missing:
+            fetch = partial(fetch_smiles, session=session)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                smiles.update(zip(missing, executor.map(fetch, missing)))
+
+    edge_arrays: Dict[str, np.ndarray] = {}
+    errors: Dict[str, Dict[str, str]] = {}
     for name in drug_list:
-        result = get_edge_list_from_pubchem(name)
-        if result is None:
-            edge_relations[name] = {"error": "edge relations not found"}
+        raw_smiles = smiles[name]
+        if raw_smiles is None:
+            errors[name] = {"error": "SMILES not found"}
+            continue
+
+        edges = smiles_to_edges(name, raw_smiles)
+        if edges is None:
+            errors[name] = {"error": "invalid SMILES"}
         else:
-            edge_relations[name] = result
+            edge_arrays[name] = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
 
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(edge_relations, f)
+    arrays = list(edge_arrays.values())
+    np.savez_compressed(
+        filename,
+        **{
+            NAMES_KEY: np.array(list(edge_arrays), dtype=str),
+            COUNTS_KEY: np.array([a.shape[0] for a in arrays], dtype=np.int64),
+            EDGES_KEY: np.concatenate(arrays) if arrays else np.empty((0, 2), dtype=np.int32),
+            ERRORS_KEY: np.array(orjson.dumps(errors).decode()),
+        },
+    )
     print(f"[INFO] Edge relations saved to '{filename}'")
 
 
@@ -79,6 +251,6 @@ if __name__ == "__main__":
     "futibatinib", "granisetron", "ibrutinib", "lenalidomide", "lomustine", "midostaurin",
     "olutasidenib", "pomalidomide", "pralatrexate", "repotrectinib", "ribociclib"
     ])
-    output_filename: str = "edge_relations.json"
-    save_edge_relations_to_json(drug_list, output_filename)
+    output_filename: str = "edge_relations.npz"
+    save_edge_relations(drug_list, output_filename)
     
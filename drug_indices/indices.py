@@ -1,26 +1,111 @@
-import json
-import networkx as nx
-from math import sqrt
+import os
+import hashlib
+import shelve
+from concurrent.futures import ProcessPoolExecutor
+import orjson
+import numpy as np
+from numba import njit
 import pandas as pd
-from typing import Any, Dict, List, Union
+from drug_indices.edges import COUNTS_KEY, EDGES_KEY, ERRORS_KEY, NAMES_KEY
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
-def load_edge_relations_from_json(filename: str) -> Dict[str, Union[List[List[int]], Dict[str,str]]]:
+def load_edge_relations(filename: str) -> Dict[str, Union[np.ndarray, Dict[str,str]]]:
     """
-    Load the edge relations of multiple drugs from a JSON file.
+    Load the edge relations of multiple drugs from a compressed NPZ file written by save_edge_relations.
 
     Parameters:
-        filename (str): The path to the JSON file containing the drug-edge relations.
+        filename (str): The path to the NPZ file containing the drug-edge relations.
 
     Returns:
-        Dict[str, Union[List[List[int]], Dict[str, str] A dictionary mapping each drug name
-        to either a list of edge pairs or an error dictionary.
+        Dict[str, Union[np.ndarray, Dict[str, str]]] A dictionary mapping each drug name
+        to either an (E, 2) int32 array of edge pairs or an error dictionary.
     """
-    with open(filename, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with np.load(filename, allow_pickle=False) as f:
+        names = f[NAMES_KEY].tolist()
+        splits = np.cumsum(f[COUNTS_KEY])[:-1]
+        data: Dict[str, Union[np.ndarray, Dict[str,str]]] = dict(zip(names, np.split(f[EDGES_KEY], splits)))
+        data.update(orjson.loads(str(f[ERRORS_KEY])))
+    return data
 
-def calculate_indices(G: nx.Graph) -> Dict[str, float]:
+INDEX_NAMES = ("M1", "M2", "mM2", "FG", "ISI", "H", "SC", "HM", "A", "SDD")
+PARALLEL_MIN_DRUGS: int = 500
+# Bump when the index definitions change so stale entries in an on-disk indices cache are no longer hit.
+INDICES_CACHE_VERSION: int = 2
+
+@njit(fastmath=True, cache=True)
+def _indices_kernel(src: np.ndarray, dst: np.ndarray, graph_id: np.ndarray, deg: np.ndarray,
+                    n_graphs: int) -> np.ndarray:
+    """
+    Accumulate all 10 indices of every graph in a single pass over the concatenated edges.
+    Returns an (n_graphs, 10) array whose columns follow INDEX_NAMES.
+    """
+    out = np.zeros((n_graphs, 10))
+    for k in range(src.shape[0]):
+        g = graph_id[k]
+        dx = deg[src[k]]
+        dy = deg[dst[k]]
+        s = dx + dy
+        p = dx * dy
+        f = dx * dx + dy * dy
+        # One division each; H, SC, ISI, mM2 and SDD (= f / p) all reuse these.
+        inv_s = 1.0 / s
+        inv_p = 1.0 / p
+
+        out[g, 0] += s
+        out[g, 1] += p
+        out[g, 2] += inv_p
+        out[g, 3] += f
+        out[g, 4] += p * inv_s
+        out[g, 5] += 2.0 * inv_s
+        out[g, 6] += np.sqrt(inv_s)
+        out[g, 7] += s * s
+        # Every endpoint of an edge has degree >= 1, so only AZ's (s - 2) denominator can be zero.
+        # Instead of branching, an isolated bond (s == 2) divides by 1 and is then masked to 0.
+        isolated = s == 2.0
+        t = p / (s - 2.0 + isolated)
+        out[g, 8] += (not isolated) * t * t * t
+        out[g, 9] += f * inv_p
+
+    return out
+
+def calculate_indices_batch(edge_lists: Sequence[Sequence[Sequence[int]]]) -> np.ndarray:
+    """
+    Compute the topological indices of many molecules at once (see calculate_indices for the definitions).
+
+    The edge lists are concatenated into one "batch graph": each molecule's atom indices are shifted
+    by an offset so they do not collide, and every edge remembers which molecule it came from.
+    The degrees of all atoms then come from one bincount and the indices from one kernel call.
+
+    Parameters:
+        edge_lists (Sequence[Sequence[Sequence[int]]]): The (atom_index1, atom_index2) bond pairs of each molecule.
+
+    Returns:
+        np.ndarray An (n_molecules, 10) array of index values in input order, with columns following INDEX_NAMES.
+    """
+    arrays = [np.asarray(edges, dtype=np.int32).reshape(-1, 2) for edges in edge_lists]
+    offsets = np.zeros(len(arrays), dtype=np.int32)
+    for k in range(1, len(arrays)):
+        prev = arrays[k - 1]
+        offsets[k] = offsets[k - 1] + (prev.max() + 1 if prev.size else 0)
+
+    counts = np.array([e.shape[0] for e in arrays], dtype=np.int64)
+    if not counts.any():
+        return np.zeros((len(arrays), len(INDEX_NAMES)))
+
+    all_edges = np.concatenate(arrays)
+    all_edges += np.repeat(offsets, counts)[:, None]
+    graph_id = np.repeat(np.arange(len(arrays), dtype=np.int32), counts)
+
+    deg = np.bincount(all_edges.ravel()).astype(np.float64)
+    src = np.ascontiguousarray(all_edges[:, 0])
+    dst = np.ascontiguousarray(all_edges[:, 1])
+
+    return _indices_kernel(src, dst, graph_id, deg, len(arrays))
+
+def calculate_indices(edges: Sequence[Sequence[int]]) -> np.ndarray:
     """
-    Compute the following 10 topological indices based on the degree of each pair of connected nodes (edges) in the graph:
+    Compute the following 10 topological indices based on the degree of each pair of connected nodes (edges) in the graph.
+    Node degrees are counted directly from the edge list, so no NetworkX graph is needed:
 
 
 
@@ -36,80 +121,127 @@ def calculate_indices(G: nx.Graph) -> Dict[str, float]:
         - SDD: dx/dy + dy/dx
 
     Parameters:
-        G (nx.Graph): An undirected graph representing the molecular structure.
+        edges (Sequence[Sequence[int]]): The (atom_index1, atom_index2) bond pairs of the molecule, each listed once.
 
     Returns:
-        Dict[str, float] A dictionary of computed index names and their values.
+        np.ndarray The 10 index values, in the order of INDEX_NAMES.
+    """
+    return calculate_indices_batch([edges])[0]
+
+def _compute_chunk(jobs: List[Tuple[str, np.ndarray]]) -> List[Tuple[str, np.ndarray]]:
+    """
+    Worker entry point: compute the indices of one chunk of (drug name, edge list) pairs as a single batch.
+    """
+    names = [name for name, _ in jobs]
+    return list(zip(names, calculate_indices_batch([edges for _, edges in jobs])))
+
+def _edges_key(edges: Any) -> str:
+    """
+    Hash an edge list into a cache key that does not depend on edge order or orientation.
     """
-    indices = {
-        "M1": 0.0, "M2": 0.0, "mM2": 0.0, "FG": 0.0, "ISI": 0.0,
-        "H": 0.0, "SC": 0.0, "HM": 0.0, "A": 0.0, "SDD": 0.0
-    }
+    e = np.sort(np.asarray(edges, dtype=np.int32).reshape(-1, 2), axis=1)
+    e = np.ascontiguousarray(e[np.lexsort((e[:, 1], e[:, 0]))])
+    digest = hashlib.blake2b(e.tobytes(), digest_size=8).hexdigest()
+    return f"v{INDICES_CACHE_VERSION}:{digest}"
 
-    for x, y in G.edges():
-        dx = G.degree[x]
-        dy = G.degree[y]
-        sum_deg = dx + dy
+def _compute_jobs(jobs: List[Tuple[str, Any]], max_workers: Optional[int]) -> Dict[str, np.ndarray]:
+    """
+    Compute the indices of (drug name, edge list) pairs, in worker processes for large panels.
+    """
+    if len(jobs) >= PARALLEL_MIN_DRUGS:
+        n_chunks = max_workers or os.cpu_count() or 1
+        chunks = [jobs[k::n_chunks] for k in range(n_chunks)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return dict(pair for chunk in executor.map(_compute_chunk, chunks) for pair in chunk)
+    return dict(_compute_chunk(jobs))
 
-        indices["M1"]  += sum_deg
-        indices["M2"]  += dx * dy
-        indices["mM2"] += 1.0 / (dx * dy) if dx*dy != 0 else 0.0
-        indices["FG"]   += dx**2 + dy**2
-        indices["ISI"] += (dx * dy) / sum_deg if sum_deg != 0 else 0.0
-        indices["H"]   += 2.0 / sum_deg if sum_deg != 0 else 0.0
-        indices["SC"]  += sqrt(1.0 / sum_deg) if sum_deg != 0 else 0.0
-        indices["HM"]  += sum_deg**2
-        if sum_deg != 2:
-            indices["A"] += ((dx * dy) / (sum_deg - 2))**3
-        indices["SDD"] += (dx / dy if dy != 0 else 0.0) + (dy / dx if dx != 0 else 0.0)
+def _compute_jobs_cached(jobs: List[Tuple[str, Any]], max_workers: Optional[int],
+                         cache_path: str) -> Dict[str, np.ndarray]:
+    """
+    Like _compute_jobs, but look each molecule up in a shelve database first and store the ones that were missing.
+    """
+    keys = {name: _edges_key(edges) for name, edges in jobs}
+    with shelve.open(cache_path) as cache:
+        computed = {name: cache[key] for name, key in keys.items() if key in cache}
+        fresh = _compute_jobs([job for job in jobs if job[0] not in computed], max_workers)
+        for name, values in fresh.items():
+            cache[keys[name]] = values
 
-    return indices
+    computed.update(fresh)
+    return computed
 
-def calculate_and_return_all_drugs(drug_list: List[str], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+def calculate_and_return_all_drugs(drug_list: List[str], data: Dict[str, Any], max_workers: Optional[int] = None,
+                                   cache_path: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-     For each drug on the list, create a graph for it and calculate its topological indices.
+     For each drug on the list, calculate its topological indices from its edge list.
+     All valid drugs are computed together in one batch (see calculate_indices_batch). Panels of at least
+     PARALLEL_MIN_DRUGS drugs are split into one batch per worker process; smaller panels stay in-process,
+     where starting the workers would cost more than the computation itself. Worker processes re-import the
+     caller's main module under the spawn and forkserver start methods, so a script that may reach that size
+     must run the pipeline under an `if __name__ == "__main__":` guard.
+
+     If cache_path is given, the raw indices are also kept in a shelve database keyed by a hash of each
+     drug's edges, so unchanged molecules are not recomputed on later runs.
 
     Parameters:
-        drug_list (List[str]): A list of drug names.
-        data (Dict[str, Any]): A dictionary containing edge lists or error messages for each drug.
+        drug_list (List[str]): A list of drug names. Results follow this order, so sort it beforehand if needed.
+        data (Dict[str, Any]): A dictionary containing edge arrays (or lists) or error messages for each drug.
+        max_workers (Optional[int]): The number of worker processes for large panels. Defaults to the CPU count.
+        cache_path (Optional[str]): The path of the shelve database used as an indices cache. Defaults to no cache.
 
     Returns:
         List[Dict[str, Any]]: A list of dictionaries containing either calculated indices or error information for each drug.
     """
+    jobs = [(name, data[name]) for name in drug_list if isinstance(data.get(name), (np.ndarray, list))]
+
+    if cache_path is None:
+        computed = _compute_jobs(jobs, max_workers)
+    else:
+        computed = _compute_jobs_cached(jobs, max_workers, cache_path)
+
+    valid = [name for name in drug_list if name in computed]
+    rounded = dict(zip(valid, np.round(np.stack([computed[name] for name in valid]), 3).tolist())) if valid else {}
+
     results: List[Dict[str, Any]] = []
-    for name in sorted(drug_list):
-        edges = data.get(name)
-        if isinstance(edges, list):
-            G = nx.Graph()
-            G.add_edges_from(edges)
-            raw = calculate_indices(G)
-            rounded = {k: round(v, 3) for k, v in raw.items()}
-            results.append({"drug": name, "indices": rounded})
+    for name in drug_list:
+        if name in rounded:
+            results.append({"drug": name, "indices": dict(zip(INDEX_NAMES, rounded[name]))})
         else:
-            results.append({"drug": name, "error": edges})
+            results.append({"drug": name, "error": data.get(name)})
     return results
 
-def save_results_to_dataframe(results: List[Dict[str, Any]], excel_path: str = "drug_indices.xlsx") -> pd.DataFrame:
+def save_results_to_dataframe(results: List[Dict[str, Any]], excel_path: str = "drug_indices.xlsx",
+                              fmt: str = "xlsx") -> pd.DataFrame:
     """
     Convert the topological index calculation results into a Pandas DataFrame and export them to an Excel file.
 
     Parameters:
         results (List[Dict[str, Any]]) A list of dictionaries containing drug names and their index values.
         excel_path (str, optional): The file path to save the Excel file. Defaults to 'drug_indices.xlsx'.
+        fmt (str, optional): 'xlsx' to write Excel through the streaming xlsxwriter engine, or 'parquet'
+            to write a Parquet file (requires pyarrow) next to excel_path with a '.parquet' extension.
+            Defaults to 'xlsx'.
 
     Returns:
         pd.DataFrame: A DataFrame containing drugs as rows and indices as columns.
     """
     valid = [r for r in results if "indices" in r]
     df = pd.DataFrame([r["indices"] for r in valid], index=[r["drug"] for r in valid])
-    df.to_excel(excel_path, index=True, engine="openpyxl")
-    print(f"[INFO] Drug indices saved to '{excel_path}'")
+    if fmt == "parquet":
+        out_path = os.path.splitext(excel_path)[0] + ".parquet"
+        df.to_parquet(out_path, index=True)
+    elif fmt == "xlsx":
+        out_path = excel_path
+        df.to_excel(out_path, index=True, engine="xlsxwriter")
+    else:
+        raise ValueError(f"Unsupported output format: '{fmt}'")
+    print(f"[INFO] Drug indices saved to '{out_path}'")
     return df
 
 # === Usage ===
 
 if __name__ == "__main__":
-    drug_list = [
+    drug_list = sorted([
         "afatinib", "alpelisib", "anastrozole", "busulfan", "dasatinib",
         "daunorubicin", "erdafitinib", "melphalan", "mitomycin c",
         "nilotinib", "olaparib", "orgovyx", "plerixafor", "prednisone",
@@ -117,8 +249,8 @@ if __name__ == "__main__":
         "futibatinib", "granisetron", "ibrutinib", "lenalidomide",
         "lomustine", "midostaurin", "olutasidenib", "pomalidomide",
         "pralatrexate", "repotrectinib", "ribociclib"
-    ]
+    ])
 
-    data = load_edge_relations_from_json("edge_relations.json")
+    data = load_edge_relations("edge_relations.npz")
     results = calculate_and_return_all_drugs(drug_list, data)
     df = save_results_to_dataframe(results, "drug_indices.xlsx")
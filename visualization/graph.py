@@ -1,8 +1,13 @@
-from drug_indices.edges import get_edge_list_from_pubchem
+from drug_indices.edges import fetch_smiles, mol_to_edges
+from rdkit import Chem
+from rdkit.Chem import AllChem
 import networkx as nx
 import matplotlib.pyplot as plt
+from typing import Optional
 
-def draw_graph(drug_name: str) -> None:
+FIGURE_NUM: str = "Drug graph"
+
+def draw_graph(drug_name: str, ax: Optional[plt.Axes] = None) -> None:
     """
     It draws a graph for a given drug using its PubChem edge list.
 
@@ -10,27 +15,49 @@ def draw_graph(drug_name: str) -> None:
     It then constructs an undirected graph based on atom connectivity and visualises it.
     using Matplotlib and NetworkX.
 
+    Atoms are placed at the 2D depiction coordinates computed by RDKit instead of running a
+    force-directed layout. Unless an axes is given, a single named figure is cleared and reused,
+    so drawing many drugs does not open a new window each time.
+
     You can also run the containing script directly via:
 
         python -m visualization.graph
 
     Parameters:
         drug_name (str): The name of the drug to visualise.
+        ax (Optional[plt.Axes]): The axes to draw on. Defaults to the reused figure, which is then shown.
 
     Returns:
         None. Displays the graph using a layout-based visualisation.
     """
 
-    edges = get_edge_list_from_pubchem(drug_name)
-    if isinstance(edges, list):
-        G = nx.Graph()
-        G.add_edges_from(edges)
-        pos = nx.spring_layout(G)
-        nx.draw(G, pos, with_labels=True, node_size=700, node_color='lightblue', font_size=10, font_color='black')
-        plt.title(f"Graph for {drug_name}")
+    raw_smiles = fetch_smiles(drug_name)
+    mol = Chem.MolFromSmiles(raw_smiles) if raw_smiles is not None else None
+    if mol is None:
+        print(f"Error retrieving edges for {drug_name}: {raw_smiles}")
+        return
+
+    AllChem.Compute2DCoords(mol)
+    conf = mol.GetConformer()
+    pos = {}
+    for i in range(mol.GetNumAtoms()):
+        point = conf.GetAtomPosition(i)
+        pos[i] = (point.x, point.y)
+
+    G = nx.Graph()
+    G.add_nodes_from(pos)
+    G.add_edges_from(mol_to_edges(mol))
+
+    show = ax is None
+    if show:
+        fig = plt.figure(num=FIGURE_NUM)
+        fig.clf()
+        ax = fig.gca()
+
+    nx.draw(G, pos, ax=ax, with_labels=True, node_size=700, node_color='lightblue', font_size=10, font_color='black')
+    ax.set_title(f"Graph for {drug_name}")
+    if show:
         plt.show()
-    else:
-        print(f"Error retrieving edges for {drug_name}: {edges}")
 
 # === Usage ===
 